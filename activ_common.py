@@ -0,0 +1,309 @@
+"""
+Helpers shared by the ACTIV market data examples: connecting a session,
+printing fields, batching snapshot requests and the common handlers.
+"""
+
+from activfinancial import *
+from activfinancial.constants import *
+
+
+# Default ACTIV server, used when the configuration does not set a host
+ACTIV_HOST = "cg-ny4-l1.activfinancial.com:9011"
+
+# Width print_field pads field names to, and the dot fillers it pads with
+# indexed by length
+NAME_WIDTH = 40
+_FILLERS = tuple("." * n for n in range(NAME_WIDTH + 1))
+
+
+def connect_session(activ_username,
+                    activ_password,
+                    handler=None,
+                    parameters={},
+                    host=None):
+    """
+    Connect to the ACTIV server using the provided credentials.
+
+        Parameters:
+            activ_username (str): The username for the ACTIV server.
+            activ_password (str): The password for the ACTIV server.
+            handler (SessionHandler): The session handler to use.
+            parameters (dict): Additional parameters to pass to the session.
+            host (str): The ACTIV server as host:port. Defaults to
+                ACTIV_HOST.
+
+        Returns:
+            session: The session object.
+    """
+
+    if handler is None:
+        handler = SessionHandler()
+
+    # Enable downloading of all available dictionaries.
+    parameters[FID_ENABLE_DICTIONARY_DOWNLOAD] = True
+
+    session = Session(parameters, handler)
+
+    connect_parameters = session.get_parameters()
+
+    connect_parameters[FID_HOST] = host or ACTIV_HOST
+    connect_parameters[FID_USER_ID] = activ_username
+    connect_parameters[FID_PASSWORD] = activ_password
+
+    print("Connecting to %s..." % connect_parameters[FID_HOST])
+    session.connect(connect_parameters, 5000)
+
+    return session
+
+
+def print_field(name, field):
+    """
+    Helper function to print a field value with nice formatting.
+
+        Parameters:
+            name (str): The name of the field.
+            field (Field): The field value.
+    """
+
+    if isinstance(field, Field):
+        if field.is_defined():
+            string = str(field)
+        else:
+            string = "undefined"
+
+        if not field.does_update_last:
+            string += " *"
+    elif field is None:
+        return
+    else:
+        string = str(field)
+
+    filler = _FILLERS[NAME_WIDTH - min(len(name), NAME_WIDTH - 1)]
+    print("%s %s %s" % (name, filler, string))
+
+
+class SessionHandler:
+    """
+    A SessionHandler class with placeholder methods for handling
+    session events.
+
+    Attributes:
+        None
+
+    Methods:
+        on_session_connect(session):
+            Called for reconnects.
+        on_session_disconnect(session):
+            Called when a graceful disconnect has completed.
+        on_session_error(session, status_code):
+            Called when an error occurs.
+        on_session_log_message(session, log_type, message):
+            Called when a log message is received.
+
+    """
+
+    __slots__ = ()
+
+    def on_session_connect(self, session):
+        # Called for reconnects.
+        print()
+        print("on_session_connect")
+        print()
+
+    def on_session_disconnect(self, session):
+        # Called when a graceful disconnect has completed.
+        print()
+        print("on_session_disconnect")
+        print()
+
+    def on_session_error(self, session, status_code):
+        print()
+        print("on_session_error:")
+        print()
+        print_field("StatusCode", status_code_to_string(status_code))
+
+    def on_session_log_message(self, session, log_type, message):
+        # Only print errors and warnings.
+        if log_type == LOG_TYPE_ERROR or log_type == LOG_TYPE_WARNING:
+            print()
+            print("on_session_log_message:")
+            print()
+            print_field("LogType", log_type_to_string(log_type))
+            print_field("Message", message)
+        else:
+            pass
+
+
+def snapshot_many(session, symbols, handler_class, progress=None):
+    """
+    Request snapshots for a list of symbols and wait for all of them to
+    complete. Every request is sent before any responses are processed so
+    the round-trips to the ACTIV server overlap rather than run one after
+    another.
+
+        Parameters:
+            session (Session): The connected session.
+            symbols (list): The symbols to request snapshots for.
+            handler_class (type): The snapshot handler class to create
+                for each symbol. It is passed the shared state dict and
+                must decrement state['pending'] once when the snapshot
+                completes or fails.
+            progress (tqdm): Optional progress bar, updated as each
+                snapshot completes.
+
+        Returns:
+            dict: The snapshot handler for each symbol.
+    """
+
+    state = {'pending': 0}
+    handler_by_symbol = {}
+    handles = []
+
+    try:
+        for symbol in symbols:
+            handler = handler_class(state)
+            handler_by_symbol[symbol] = handler
+            handles.append(
+                session.snapshot(DATA_SOURCE_ACTIV, symbol, handler))
+
+        completed = 0
+        while state['pending'] > 0:
+            session.process()
+            if progress is not None:
+                done = len(handler_by_symbol) - state['pending']
+                progress.update(done - completed)
+                completed = done
+    finally:
+        for handle in handles:
+            handle.close()
+        if progress is not None:
+            progress.close()
+
+    return handler_by_symbol
+
+
+class SnapshotHandlerFields:
+    """
+    A base SnapshotHandler class which stores the fields named in the
+    subclass's _FIELD_NAMES for a symbol.
+
+    Attributes:
+        complete (bool): A flag indicating if the snapshot is complete.
+        _state (dict): Shared state whose 'pending' count is decremented
+            when the snapshot completes.
+        data (dict): A dictionary to store the field values.
+
+    Methods:
+        on_snapshot(msg, context):
+            Called when a snapshot is received.
+        on_snapshot_failure(msg, context):
+            Called when a snapshot request fails.
+    """
+
+    # Names of the fields to store, set by each subclass
+    _FIELD_NAMES = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Field ids of the wanted fields by data source, filled on first
+        # use - kept per subclass as each wants different fields
+        cls._wanted_fids_by_ds = {}
+
+    def __init__(self, state):
+        self.complete = False
+        self._state = state
+        state['pending'] += 1
+        self.data = dict.fromkeys(self._FIELD_NAMES, "")
+
+    @classmethod
+    def _get_wanted_fids(cls, session, data_source_id):
+        """
+        Get the field ids of the wanted fields for a data source.
+
+            Parameters:
+                session (Session): The connected session.
+                data_source_id (int): The data source of the snapshot.
+
+            Returns:
+                dict: The field name for each wanted field id.
+        """
+
+        wanted_fids = cls._wanted_fids_by_ds.get(data_source_id)
+        if wanted_fids is None:
+            wanted_fids = {}
+            for name in cls._FIELD_NAMES:
+                fid = session.metadata.get_field_id(data_source_id, name)
+                if fid is not None:
+                    wanted_fids[fid] = name
+            cls._wanted_fids_by_ds[data_source_id] = wanted_fids
+        return wanted_fids
+
+    def on_snapshot(self, msg, context):
+        if not self.complete:
+            self.complete = True
+            self._state['pending'] -= 1
+
+        wanted_fids = self._get_wanted_fids(context.session,
+                                            msg.data_source_id)
+        for fid, name in wanted_fids.items():
+            field = msg.fields.get(fid)
+            if field is not None:
+                self.data[name] = field.to_native()
+
+    def on_snapshot_failure(self, msg, context):
+        if not self.complete:
+            self.complete = True
+            self._state['pending'] -= 1
+
+        print()
+        print("on_snapshot_failure:")
+        print()
+        print_field("DataSource", msg.data_source_id)
+        print_field("Symbology", msg.symbology_id)
+        print_field("Symbol", msg.symbol)
+        print_field("StatusCode", status_code_to_string(msg.status_code))
+
+
+class SnapshotHandlerTradeInfo(SnapshotHandlerFields):
+    """
+    A custom SnapshotHandler class for handling trade information.
+    It will request then store the trade information for a symbol.
+
+    Attributes:
+        complete (bool): A flag indicating if the snapshot is complete.
+        _state (dict): Shared state whose 'pending' count is decremented
+            when the snapshot completes.
+        data (dict): A dictionary to store the trade information.
+
+    Methods:
+        on_snapshot(msg, context):
+            Called when a snapshot is received.
+        on_snapshot_failure(msg, context):
+            Called when a snapshot request fails.
+    """
+
+    _FIELD_NAMES = (
+        "LastReportedTrade",
+        "LastReportedTradeSize",
+        "LastReportedTradeTime",
+        "LastReportedTradeDate",
+        "Bid",
+        "BidSize",
+        "BidTime",
+        "Ask",
+        "AskSize",
+        "AskTime",
+        "TradeHigh",
+        "TradeHighTime",
+        "TradeLow",
+        "TradeLowTime",
+        "Open",
+        "OpenTime",
+        "PreviousClose",
+        "PreviousOpen",
+        "PreviousTradeHigh",
+        "PreviousTradeLow",
+        "PreviousPercentChange",
+        "Currency",
+        "Symbol"
+    )
@@ -0,0 +1,39 @@
+"""
+Session helpers shared by the ACTIV market data examples.
+
+A connected session is cached for the life of the process so scripts that
+run in the same interpreter share one connection (and one dictionary
+download) instead of each connecting and authenticating again.
+"""
+
+import atexit
+
+from activ_common import connect_session
+
+
+_session = None
+
+
+def get_session(config):
+    """
+    Get the shared session for the process, connecting on first use with
+    the credentials and optional host from the configuration. The session
+    is disconnected when the interpreter exits.
+
+        Parameters:
+            config (dict): The loaded configuration file.
+
+        Returns:
+            session: The connected session object.
+    """
+
+    global _session
+
+    if _session is None:
+        _session = connect_session(
+            config['activCredentials']['activ_username'],
+            config['activCredentials']['activ_password'],
+            host=config['activCredentials'].get('host'))
+        atexit.register(_session.disconnect)
+
+    return _session
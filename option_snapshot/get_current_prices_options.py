@@ -1,210 +1,49 @@
 import os
-import json
+import sys
+import atexit
 import csv
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from inspect import getsourcefile
 
 from activfinancial import *
 from activfinancial.constants import *
+import orjson
 from tqdm import tqdm
 import pandas as pd
 
 
-def connect_session(activ_username,
-                    activ_password,
-                    handler=None,
-                    parameters={}):
-    """
-    Connect to the ACTIV server using the provided credentials.
-
-        Parameters:
-            activ_username (str): The username for the ACTIV server.
-            activ_password (str): The password for the ACTIV server.
-            handler (SessionHandler): The session handler to use.
-            parameters (dict): Additional parameters to pass to the session.
-
-        Returns:
-            session: The session object.
-    """
-
-    if handler is None:
-        handler = SessionHandler()
-
-    # Enable downloading of all available dictionaries.
-    parameters[FID_ENABLE_DICTIONARY_DOWNLOAD] = True
-
-    session = Session(parameters, handler)
-
-    connect_parameters = session.get_parameters()
-
-    activ_host = "cg-ny4-l1.activfinancial.com:9011"
-
-    connect_parameters[FID_HOST] = activ_host
-    connect_parameters[FID_USER_ID] = activ_username
-    connect_parameters[FID_PASSWORD] = activ_password
-
-    print("Connecting to %s..." % connect_parameters[FID_HOST])
-    session.connect(connect_parameters, 5000)
-
-    return session
-
-
-def print_field(name, field):
-    """
-    Helper function to print a field value with nice formatting.
-
-        Parameters:
-            name (str): The name of the field.
-            field (Field): The field value.
-    """
-
-    NAME_WIDTH = 40
-    filler = "." * (NAME_WIDTH - len(name[:NAME_WIDTH - 1]))
-
-    if isinstance(field, Field):
-        if field.is_defined():
-            string = str(field)
-        else:
-            string = "undefined"
-
-        if not field.does_update_last:
-            string += " *"
-    elif field is None:
-        return
-    else:
-        string = str(field)
-
-    print("%s %s %s" % (name, filler, string))
-
-
-class SessionHandler:
-    """
-    A SessionHandler class with placeholder methods for handling
-    session events.
-
-    Attributes:
-        None
-
-    Methods:
-        on_session_connect(session):
-            Called for reconnects.
-        on_session_disconnect(session):
-            Called when a graceful disconnect has completed.
-        on_session_error(session, status_code):
-            Called when an error occurs.
-        on_session_log_message(session, log_type, message):
-            Called when a log message is received.
-
-    """
-
-    def on_session_connect(self, session):
-        # Called for reconnects.
-        print()
-        print("on_session_connect")
-        print()
-
-    def on_session_disconnect(self, session):
-        # Called when a graceful disconnect has completed.
-        print()
-        print("on_session_disconnect")
-        print()
-
-    def on_session_error(self, session, status_code):
-        print()
-        print("on_session_error:")
-        print()
-        print_field("StatusCode", status_code_to_string(status_code))
-
-    def on_session_log_message(self, session, log_type, message):
-        # Only print errors and warnings.
-        if log_type == LOG_TYPE_ERROR or log_type == LOG_TYPE_WARNING:
-            print()
-            print("on_session_log_message:")
-            print()
-            print_field("LogType", log_type_to_string(log_type))
-            print_field("Message", message)
-        else:
-            pass
+# Directory containing this script
+_HERE = Path(__file__).resolve().parent
 
+# The helpers shared by the examples live in the repository root
+sys.path.append(str(_HERE.parent))
+from activ_common import (SnapshotHandlerFields, SnapshotHandlerTradeInfo,
+                          connect_session, print_field, snapshot_many)
+from activ_session import get_session
 
-class SnapshotHandlerTradeInfo:
-    """
-    A custom SnapshotHandler class for handling trade information.
-    It will request then store the trade information for a symbol.
+# Set LST_VERBOSE to print the full details of each request as it completes
+VERBOSE = bool(os.environ.get('LST_VERBOSE'))
 
-    Attributes:
-        complete (bool): A flag indicating if the snapshot is complete.
-        data (dict): A dictionary to store the trade information.
 
-    Methods:
-        on_snapshot(msg, context):
-            Called when a snapshot is received.
-        on_snapshot_failure(msg, context):
-            Called when a snapshot request fails.
-    """
+# Number of worker threads (each with its own session) used to query the
+# option chains for the underlyings in parallel
+NUM_WORKERS = 4
 
-    def __init__(self):
-        self.complete = False
-        self.data = {
-            "LastReportedTrade": "",
-            "LastReportedTradeSize": "",
-            "LastReportedTradeTime": "",
-            "LastReportedTradeDate": "",
-            "Bid": "",
-            "BidSize": "",
-            "BidTime": "",
-            "Ask": "",
-            "AskSize": "",
-            "AskTime": "",
-            "TradeHigh": "",
-            "TradeHighTime": "",
-            "TradeLow": "",
-            "TradeLowTime": "",
-            "Open": "",
-            "OpenTime": "",
-            "PreviousClose": "",
-            "PreviousOpen": "",
-            "PreviousTradeHigh": "",
-            "PreviousTradeLow": "",
-            "PreviousPercentChange": "",
-            "Currency": "",
-            "Symbol": ""
-        }
-
-    def on_snapshot(self, msg, context):
-        self.complete = True
-        ask = ""
-        ask_time = ""
-
-        for (fid, field) in msg.fields.items():
-            field_name = context.session.metadata.get_field_name(
-                msg.data_source_id, fid)
-
-            if field_name in self.data.keys():
-                value = field.to_native()
-                self.data[field_name] = value
-
-    def on_snapshot_failure(self, msg, context):
-        self.complete = True
+_worker = threading.local()
 
-        print()
-        print("on_snapshot_failure:")
-        print()
-        print_field("DataSource", msg.data_source_id)
-        print_field("Symbology", msg.symbology_id)
-        print_field("Symbol", msg.symbol)
-        print_field("StatusCode", status_code_to_string(msg.status_code))
 
-
-class SnapshotHandlerOptionInfo:
+class SnapshotHandlerOptionInfo(SnapshotHandlerFields):
     """
     A custom SnapshotHandler class for handling option information.
     It will request then store the option information for a symbol.
 
     Attributes:
         complete (bool): A flag indicating if the snapshot is complete.
+        _state (dict): Shared state whose 'pending' count is decremented
+            when the snapshot completes.
         data (dict): A dictionary to store the option information.
 
     Methods:
@@ -214,50 +53,24 @@ class SnapshotHandlerOptionInfo:
             Called when a snapshot request fails.
     """
 
-    def __init__(self):
-        self.complete = False
-        self.data = {
-            "ClosingBid": "",
-            "ClosingAsk": "",
-            "Close": "",
-            "Bid": "",
-            "BidSize": "",
-            "Ask": "",
-            "AskSize": "",
-            "OpenInterest": "",
-            "Trade": "",
-            "TradeSize": "",
-            "CumulativeValue": "",
-            "CumulativeVolume": "",
-            "ExpirationDate": "",
-            "OptionType": "",
-            "StrikePrice": "",
-            "Symbol": ""
-        }
-
-    def on_snapshot(self, msg, context):
-        self.complete = True
-        ask = ""
-        ask_time = ""
-
-        for (fid, field) in msg.fields.items():
-            field_name = context.session.metadata.get_field_name(
-                msg.data_source_id, fid)
-
-            if field_name in self.data.keys():
-                value = field.to_native()
-                self.data[field_name] = value
-
-    def on_snapshot_failure(self, msg, context):
-        self.complete = True
-
-        print()
-        print("on_snapshot_failure:")
-        print()
-        print_field("DataSource", msg.data_source_id)
-        print_field("Symbology", msg.symbology_id)
-        print_field("Symbol", msg.symbol)
-        print_field("StatusCode", status_code_to_string(msg.status_code))
+    _FIELD_NAMES = (
+        "ClosingBid",
+        "ClosingAsk",
+        "Close",
+        "Bid",
+        "BidSize",
+        "Ask",
+        "AskSize",
+        "OpenInterest",
+        "Trade",
+        "TradeSize",
+        "CumulativeValue",
+        "CumulativeVolume",
+        "ExpirationDate",
+        "OptionType",
+        "StrikePrice",
+        "Symbol"
+    )
 
 
 class QueryHandler:
@@ -268,6 +81,8 @@ class QueryHandler:
 
     Attributes:
         complete (bool): A flag indicating if the query is complete.
+        _state (dict): Shared state whose 'pending' count is decremented
+            when the query completes.
         symbols (list): A list to store the symbols which match the query.
 
     Methods:
@@ -285,8 +100,10 @@ class QueryHandler:
             Called when a query fails with a failure.
     """
 
-    def __init__(self):
+    def __init__(self, state):
         self.complete = False
+        self._state = state
+        state['pending'] += 1
         self.symbols = []
 
     def on_query_start(self, context):
@@ -302,11 +119,16 @@ class QueryHandler:
         pass
 
     def on_query_complete(self, context):
-        self.complete = True
-        print_field("TopicsFound", self.count)
+        if not self.complete:
+            self.complete = True
+            self._state['pending'] -= 1
+        if VERBOSE:
+            print_field("TopicsFound", self.count)
 
     def on_query_error(self, status_code, context):
-        self.complete = True
+        if not self.complete:
+            self.complete = True
+            self._state['pending'] -= 1
 
         print()
         print("on_query_error:")
@@ -314,7 +136,9 @@ class QueryHandler:
         print_field("StatusCode", status_code_to_string(status_code))
 
     def on_query_failure(self, status_code, context):
-        self.complete = True
+        if not self.complete:
+            self.complete = True
+            self._state['pending'] -= 1
 
         print()
         print("on_query_failure:")
@@ -322,6 +146,95 @@ class QueryHandler:
         print_field("StatusCode", status_code_to_string(status_code))
 
 
+def process_underlying(session, symbol, option_data_pd_filtered,
+                       known_option_symbols, position=None):
+    """
+    Get the currently active options for an underlying, keep the cached
+    details for those which are already known and request the details for
+    any new options.
+
+        Parameters:
+            session (Session): The connected session.
+            symbol (list): The underlying symbol and its current price.
+            option_data_pd_filtered (DataFrame): The cached option data for
+                this underlying.
+            known_option_symbols (set): The option symbols in the cached
+                option data, used to find new options.
+            position (int): The line to draw the progress bar on, so the
+                bars of underlyings processed in parallel do not overlap.
+
+        Returns:
+            tuple: A list of rows of cached option data for the active
+                options and a list of rows for the new options.
+    """
+
+    print('Requesting options symbols for %s...' % symbol[0])
+    state = {'pending': 0}
+    handler = QueryHandler(state)
+    handle = session.query(
+        DATA_SOURCE_ACTIV,
+        'symbol=%s navigate=option' % symbol[0],
+        handler)
+
+    try:
+        while state['pending'] > 0:
+            session.process()
+    finally:
+        option_symbols = handler.symbols
+        handle.close()
+
+    # Check for symbol overlap between currently active options
+    # and cached options data
+    option_symbols_active = set(option_symbols)
+    option_data_overlap = [
+        (symbol[0],
+         row.OptionSymbol,
+         row.OptionType,
+         row.StrikePrice,
+         row.ExpirationDate)
+        for row in option_data_pd_filtered.itertuples(index=False)
+        if row.OptionSymbol in option_symbols_active]
+
+    # Check for new symbols
+    option_symbols_new_list = [s for s in option_symbols
+                               if s not in known_option_symbols]
+
+    option_data = []
+    if len(option_symbols_new_list) > 0:
+        print("Getting option details for %s" % symbol)
+
+        handlerByOption = snapshot_many(
+            session,
+            option_symbols_new_list,
+            SnapshotHandlerOptionInfo,
+            tqdm(total=len(option_symbols_new_list), desc=symbol[0],
+                 position=position, leave=False, mininterval=1.0,
+                 miniters=100, disable=not sys.stderr.isatty()))
+
+        for handler in handlerByOption.values():
+            option_data.append((symbol[0],
+                                handler.data['Symbol'],
+                                handler.data['OptionType'],
+                                handler.data['StrikePrice'],
+                                handler.data['ExpirationDate']))
+
+    return option_data_overlap, option_data
+
+
+def _connect_worker(activ_username, activ_password, host, sessions):
+    # Thread pool initializer - give each worker thread its own session
+    _worker.session = connect_session(activ_username, activ_password,
+                                      host=host)
+    sessions.append(_worker.session)
+    # Each worker draws its progress bars on its own line
+    _worker.position = sessions.index(_worker.session)
+
+
+def _process_underlying_in_worker(*args):
+    return process_underlying(_worker.session, *args,
+                              position=_worker.position)
+
+
 if __name__ == '__main__':
     # Define the command line arguments
     parser = argparse.ArgumentParser(
@@ -335,188 +248,174 @@ if __name__ == '__main__':
     if args.config:
         config_path = Path(args.config)
     else:
-        config_path = (Path(os.path.dirname(os.path.abspath(
-            getsourcefile(lambda: 0)))).joinpath('config.json'))
+        config_path = _HERE.joinpath('config.json')
 
-    with open(config_path) as f:
-        config = json.load(f)
+    config = orjson.loads(config_path.read_bytes())
 
     # Set the data file path for the option data
-    data_dir = Path(os.path.dirname(os.path.abspath(
-        getsourcefile(lambda: 0))))
-    options_full_file = data_dir.joinpath('option_data.csv')
+    data_dir = _HERE
+    options_full_file = data_dir.joinpath('option_data.parquet')
+    options_legacy_file = data_dir.joinpath('option_data.csv')
     options_filtered_file = data_dir.joinpath('option_data_filtered.csv')
 
-    option_data_pd = pd.read_csv(options_full_file)
-    option_data_pd['Check'] = 1
+    # Fall back to the CSV cache written by earlier versions - it is
+    # replaced by the Parquet file at the end of the run
+    if options_full_file.exists() or not options_legacy_file.exists():
+        option_data_pd = pd.read_parquet(options_full_file)
+    else:
+        option_data_pd = pd.read_csv(
+            options_legacy_file,
+            engine='pyarrow',
+            dtype={'Underlying': 'string',
+                   'OptionSymbol': 'string',
+                   'OptionType': 'category',
+                   'StrikePrice': 'float64'},
+            parse_dates=['ExpirationDate'])
+
+    # Index the cached option data by underlying and by option symbol once
+    # rather than scanning the full table for every underlying
+    option_data_by_underlying = dict(tuple(
+        option_data_pd.groupby('Underlying', sort=False)))
+    option_data_empty_pd = option_data_pd.iloc[0:0]
+    known_option_symbols = set(
+        option_data_pd['OptionSymbol'].to_numpy().tolist())
 
     # Set the list of symbols to update from the configuration file
     symbolList = config['symbols']
 
     # Connect to the ACTIV server
-    session = connect_session(config['activCredentials']['activ_username'],
-                              config['activCredentials']['activ_password'])
-
-    # Empty dicts to store the handlers and handles used for
-    # the snapshot requests
-    handlerBySymbol = {}
-    handleBySymbol = {}
+    session = get_session(config)
 
     # For each symbol get the last traded price - used to filter the options
     # by strike price vs current price
-    for symbol in symbolList:
-        print('Requesting snapshot for %s...' % symbol)
-        handler = SnapshotHandlerTradeInfo()
-        handlerBySymbol[symbol] = handler
-        handle = session.snapshot(DATA_SOURCE_ACTIV, symbol, handler)
-        handleBySymbol[symbol] = handle
+    print('Requesting snapshots for %s...' % ', '.join(symbolList))
+    handlerBySymbol = snapshot_many(session, symbolList,
+                                    SnapshotHandlerTradeInfo)
 
     underlying_curent_prices = []
-    snapshotComplete = False
-    try:
-        while not snapshotComplete:
-            session.process()
-            for handler in handlerBySymbol.values():
-                snapshotComplete = True
-                if not handler.complete:
-                    snapshotComplete = False
-                    break
-    finally:
-        for handler in handlerBySymbol.values():
-            underlying_curent_prices.append(
-                [handler.data['Symbol'], handler.data['LastReportedTrade']])
-
-        for handle in handleBySymbol.values():
-            handle.close()
+    for handler in handlerBySymbol.values():
+        underlying_curent_prices.append(
+            [handler.data['Symbol'], handler.data['LastReportedTrade']])
 
     # Get a list of currently active options for each symbol,
-    # compare this to the cached options data from the options_data.csv file,
-    # remove any options that are no longer active then request the details
-    # for any new options
+    # compare this to the cached options data from the option_data.parquet
+    # file, remove any options that are no longer active then request the
+    # details for any new options
     option_data = []  # New option data
-    option_data_updated_list = []  # Updated currently active options
-
-    for symbol in underlying_curent_prices:
-        print('Requesting options symbols for %s...' % symbol[0])
-        handler = QueryHandler()
-        handle = session.query(
-            DATA_SOURCE_ACTIV,
-            'symbol=%s navigate=option' % symbol[0],
-            handler)
-
+    option_data_overlap = []  # Cached data for currently active options
+
+    # Each worker thread connects its own session so the queries and
+    # snapshots for different underlyings overlap on the network
+    worker_sessions = []
+    with ThreadPoolExecutor(
+            max_workers=max(1, min(NUM_WORKERS,
+                                   len(underlying_curent_prices))),
+            initializer=_connect_worker,
+            initargs=(config['activCredentials']['activ_username'],
+                      config['activCredentials']['activ_password'],
+                      config['activCredentials'].get('host'),
+                      worker_sessions)) as executor:
         try:
-            while not handler.complete:
-                session.process()
+            futures = [
+                executor.submit(_process_underlying_in_worker,
+                                symbol,
+                                option_data_by_underlying.get(
+                                    symbol[0], option_data_empty_pd),
+                                known_option_symbols)
+                for symbol in underlying_curent_prices]
+
+            for future in as_completed(futures):
+                overlap_rows, new_rows = future.result()
+                option_data_overlap.extend(overlap_rows)
+                option_data.extend(new_rows)
         finally:
-            option_symbols = handler.symbols
-            handle.close()
-
-        # Check for symbol overlap between currently active options
-        # and cached options data
-        # If there is overlap then add the cached option data to the
-        # option_data_updated_list
-        option_symbols_pd = pd.DataFrame(option_symbols,
-                                         columns=['OptionSymbol'])
-
-        option_data_pd_filtered = option_data_pd[
-            option_data_pd['Underlying'] == symbol[0]]
-        option_data_pd_filtered = (option_symbols_pd.merge(
-            option_data_pd_filtered,
-            how='inner',
-            on='OptionSymbol')
-            .drop(columns=['Check'])
-            [['Underlying',
-              'OptionSymbol',
-              'OptionType',
-              'StrikePrice',
-              'ExpirationDate']])
-        option_data_updated_list.append(option_data_pd_filtered)
-
-        # Check for new symbols
-        option_symbols_new = (option_symbols_pd.merge(option_data_pd[[
-            'OptionSymbol', 'Check']],
-            how='left',
-            on='OptionSymbol')
-            .query('Check.isna()'))
-
-        if len(option_symbols_new) > 0:
-            print("Getting option details for %s" % symbol)
-
-            for option_symbol in tqdm(option_symbols_new.itertuples(),
-                                      total=len(option_symbols_new)):
-
-                handler = SnapshotHandlerOptionInfo()
-                handle = session.snapshot(
-                    DATA_SOURCE_ACTIV, option_symbol.OptionSymbol, handler)
-
-                try:
-                    while not handler.complete:
-                        session.process()
-                finally:
-                    option_data.append([symbol[0],
-                                        handler.data['Symbol'],
-                                        handler.data['OptionType'],
-                                        handler.data['StrikePrice'],
-                                        handler.data['ExpirationDate']])
-                    handle.close()
+            executor.shutdown(cancel_futures=True)
 
-    # Combine the updated option data and the new option data
-    if len(option_data) > 0:
-        option_data_new_pd = pd.DataFrame(option_data, columns=[
-            'Underlying',
-            'OptionSymbol',
-            'OptionType',
-            'StrikePrice',
-            'ExpirationDate'])
-        option_data_updated_list.append(option_data_new_pd)
+            # The main session is not processed while the workers run, so
+            # keep a worker session, which was, for the filtered snapshots
+            if worker_sessions:
+                session = worker_sessions.pop()
+                atexit.register(session.disconnect)
+            for worker_session in worker_sessions:
+                worker_session.disconnect()
 
-    option_data_output_pd = pd.concat(
-        option_data_updated_list).sort_values(by='Underlying')
-    option_data_output_pd['StrikePrice'] = option_data_output_pd[
+    # Combine the updated option data and the new option data
+    option_data_columns = ['Underlying',
+                           'OptionSymbol',
+                           'OptionType',
+                           'StrikePrice',
+                           'ExpirationDate']
+    option_data_overlap_pd = pd.DataFrame(option_data_overlap,
+                                          columns=option_data_columns)
+    option_data_new_pd = pd.DataFrame(option_data,
+                                      columns=option_data_columns)
+    # Only the new rows need converting - the cached rows keep their
+    # types from the Parquet file
+    option_data_new_pd['StrikePrice'] = option_data_new_pd[
         'StrikePrice'].astype(float)
-    option_data_output_pd['ExpirationDate'] = pd.to_datetime(
-        option_data_output_pd['ExpirationDate'])
+    option_data_new_pd['ExpirationDate'] = pd.to_datetime(
+        option_data_new_pd['ExpirationDate'])
 
-    # Save the updated option data to the options_data.csv file
-    option_data_output_pd.to_csv(options_full_file, index=False)
+    option_data_output_pd = pd.concat(
+        [option_data_overlap_pd, option_data_new_pd]).sort_values(
+            by='Underlying')
+
+    # Save the updated option data to the option_data.parquet file
+    option_data_output_pd.to_parquet(options_full_file, index=False,
+                                     compression='snappy')
+
+    # Get the options for all equity symbols which have a strike price
+    # within 5% of the current price and an expiration date in the next
+    # 12 months, filtering the whole table in a single pass
+    current_prices_pd = pd.DataFrame(
+        underlying_curent_prices,
+        columns=['Underlying', 'CurrentPrice']).assign(
+            CurrentPrice=lambda d: d.CurrentPrice.astype(float))
+    option_symbol_filtered = option_data_output_pd.merge(
+        current_prices_pd, on='Underlying', how='inner')
+
+    now = datetime.now()
+    horizon = now + pd.DateOffset(months=12)
+
+    option_symbol_filtered = option_symbol_filtered[
+        (option_symbol_filtered['StrikePrice'] >=
+            option_symbol_filtered['CurrentPrice'] * 0.95) &
+        (option_symbol_filtered['StrikePrice'] <=
+            option_symbol_filtered['CurrentPrice'] * 1.05) &
+        (option_symbol_filtered['ExpirationDate'] > now) &
+        (option_symbol_filtered['ExpirationDate'] <= horizon)]
 
-    # For each equity symbol get a list of options which have a
-    # strike price within 2% of the current price
-    # and an expiration date between 2 and 4 months from now
     option_data_filtered = []
-    for symbol in underlying_curent_prices:
-        print('Getting options for %s...' % symbol[0])
-        current_price = float(symbol[1])
-
-        option_symbol_filtered = option_data_output_pd[
-            option_data_output_pd['Underlying'] == symbol[0]]
-
-        option_symbol_filtered = option_symbol_filtered[
-            (option_symbol_filtered['StrikePrice'] >= current_price * 0.95) &
-            (option_symbol_filtered['StrikePrice'] <= current_price * 1.05) &
-            (option_symbol_filtered['ExpirationDate'] >
-                datetime.now()) &
-            (option_symbol_filtered['ExpirationDate'] <=
-                datetime.now() + pd.DateOffset(months=12))]
-
-        if len(option_symbol_filtered) > 0:
-            print("Getting filtered option details for %s" % symbol)
-
-            for option_symbol in tqdm(option_symbol_filtered.itertuples(),
-                                      total=len(option_symbol_filtered)):
-
-                handler = SnapshotHandlerOptionInfo()
-                handle = session.snapshot(
-                    DATA_SOURCE_ACTIV, option_symbol.OptionSymbol, handler)
-
-                try:
-                    while not handler.complete:
-                        session.process()
-                finally:
-                    option_data_current = [symbol[0],]
-                    option_data_current.extend(handler.data.values())
-                    option_data_filtered.append(option_data_current)
-                    handle.close()
+    if len(option_symbol_filtered) > 0:
+        print("Getting filtered option details for %d options..." %
+              len(option_symbol_filtered))
+
+        handlerByOption = snapshot_many(
+            session,
+            list(option_symbol_filtered.OptionSymbol),
+            SnapshotHandlerOptionInfo,
+            tqdm(total=len(option_symbol_filtered), mininterval=1.0,
+                 miniters=100, disable=not sys.stderr.isatty()))
+
+        for option_symbol in option_symbol_filtered.itertuples():
+            d = handlerByOption[option_symbol.OptionSymbol].data
+            option_data_filtered.append((option_symbol.Underlying,
+                                         d['ClosingBid'],
+                                         d['ClosingAsk'],
+                                         d['Close'],
+                                         d['Bid'],
+                                         d['BidSize'],
+                                         d['Ask'],
+                                         d['AskSize'],
+                                         d['OpenInterest'],
+                                         d['Trade'],
+                                         d['TradeSize'],
+                                         d['CumulativeValue'],
+                                         d['CumulativeVolume'],
+                                         d['ExpirationDate'],
+                                         d['OptionType'],
+                                         d['StrikePrice'],
+                                         d['Symbol']))
 
     # Save the filtered option data to the options_data_filtered.csv file
     option_data_filtered_pd = pd.DataFrame(
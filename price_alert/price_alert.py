@@ -1,14 +1,20 @@
 from activfinancial import *
 from activfinancial.constants import *
-import json
-from inspect import getsourcefile
+import orjson
 from pathlib import Path
 import common
-import os
 import argparse
-from threading import Timer
+import hashlib
+import threading
 import time
 import logging
+from collections import defaultdict
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+
+# Directory containing this script
+_HERE = Path(__file__).resolve().parent
 
 
 # Setup the logging configuration
@@ -28,20 +34,28 @@ args = parser.parse_args()
 if args.config:
     config_path = Path(args.config)
 else:
-    config_path = Path(os.path.dirname(os.path.abspath(
-        getsourcefile(lambda: 0)))).joinpath('config.json')
+    config_path = _HERE.joinpath('config.json')
 
 
-def load_config(config_path):
+def load_config(config_path, prev_content_hash=None):
     """
-    Load the configuration file.
+    Load the configuration file, hashing the same bytes that are parsed.
 
     Parameters:
         config_path (str): The path to the configuration file.
+        prev_content_hash (bytes): The hash of the content last loaded.
+
+    Returns:
+        tuple: The configuration, or None if the content is unchanged
+            since prev_content_hash, and the hash of the content.
     """
 
-    with open(config_path) as f:
-        return json.load(f)
+    content = Path(config_path).read_bytes()
+    content_hash = hashlib.blake2b(content, digest_size=16).digest()
+    if content_hash == prev_content_hash:
+        return None, content_hash
+
+    return orjson.loads(content), content_hash
 
 
 
@@ -59,51 +73,220 @@ def start_session(config):
 
     return session, parameters_handle
 
-# Function to configure the subscriptions
 
+class MultiAlertHandler:
+    """
+    A subscription handler which passes each callback on to every alert
+    handler for one symbol, so each symbol is subscribed to once however
+    many alerts watch it.
+
+    Attributes:
+        handler_by_alertID (dict): The alert handlers for the symbol.
+
+    Methods:
+        on_subscription_refresh(msg, context):
+            Called when the initial or a refreshed image is received.
+        on_subscription_topic_status(msg, context):
+            Called when the status of the topic changes.
+        on_subscription_update(msg, context):
+            Called when an update is received.
+        on_subscription_error(status_code, context):
+            Called when an error occurs on the subscription.
+        on_subscription_failure(status_code, context):
+            Called when the subscription fails.
+    """
+
+    def __init__(self):
+        self.handler_by_alertID = {}
+
+    def _dispatch(self, name, *args):
+        # Only forward the callbacks the alert handlers implement
+        for handler in self.handler_by_alertID.values():
+            callback = getattr(handler, name, None)
+            if callback is not None:
+                callback(*args)
+
+    def on_subscription_refresh(self, msg, context):
+        self._dispatch('on_subscription_refresh', msg, context)
 
+    def on_subscription_topic_status(self, msg, context):
+        self._dispatch('on_subscription_topic_status', msg, context)
+
+    def on_subscription_update(self, msg, context):
+        self._dispatch('on_subscription_update', msg, context)
+
+    def on_subscription_error(self, status_code, context):
+        self._dispatch('on_subscription_error', status_code, context)
+
+    def on_subscription_failure(self, status_code, context):
+        self._dispatch('on_subscription_failure', status_code, context)
+
+
+def subscribe(symbol, handler):
+    logger.info('Subscribing to %s...', symbol)
+
+    return session.subscribe(DATA_SOURCE_ACTIV,
+                             symbol,
+                             handler,
+                             parameters=parameters_handle)
+
+
+# Function to configure the subscriptions
 def configure_subscriptions(config):
     handler_by_alertID = {}
-    handle_by_alertID = {}
+    multi_handler_by_symbol = defaultdict(MultiAlertHandler)
 
     for alert in config['alerts']:
-        logger.info(f'Subscribing to {alert["symbol"]}...')
-
         handler = common.SubscriptionHandlerAlert(alert)
         handler_by_alertID[alert['alertID']] = handler
+        multi_handler_by_symbol[alert['symbol']].handler_by_alertID[
+            alert['alertID']] = handler
+
+    handle_by_symbol = {symbol: subscribe(symbol, multi_handler)
+                        for symbol, multi_handler
+                        in multi_handler_by_symbol.items()}
 
-        handle = session.subscribe(DATA_SOURCE_ACTIV,
-                                   alert['symbol'],
-                                   handler,
-                                   parameters=parameters_handle)
-        handle_by_alertID[alert['alertID']] = handle
+    return handler_by_alertID, dict(multi_handler_by_symbol), handle_by_symbol
 
-    return handler_by_alertID, handle_by_alertID
 
+def update_subscriptions(prev_alert_by_alertID, alert_by_alertID,
+                         handler_by_alertID, multi_handler_by_symbol,
+                         handle_by_symbol):
+    """
+    Apply a configuration change. Alerts modified on the same symbol have
+    their handler replaced in place without touching the subscription.
+    Handlers are removed for removed alerts and for alerts moved to
+    another symbol, and are added for new and moved alerts. Symbols are
+    only subscribed to or unsubscribed from when their first alert is
+    added or their last alert is removed, and unchanged alerts keep their
+    handler state. A handler added to a symbol which is already
+    subscribed receives no refresh image, so it only sees the updates
+    after the change.
 
-# Function to create configuration file watch
+    Parameters:
+        prev_alert_by_alertID (dict): The alerts from the previous
+            configuration.
+        alert_by_alertID (dict): The alerts from the new configuration.
+        handler_by_alertID (dict): The current alert handlers, updated in
+            place.
+        multi_handler_by_symbol (dict): The current subscription handlers,
+            updated in place.
+        handle_by_symbol (dict): The current handles, updated in place.
+    """
+
+    for alertID, alert in prev_alert_by_alertID.items():
+        new_alert = alert_by_alertID.get(alertID)
+        if new_alert == alert:
+            continue
+
+        symbol = alert['symbol']
+        multi_handler = multi_handler_by_symbol[symbol]
+
+        if new_alert is not None and new_alert['symbol'] == symbol:
+            # Modified on the same symbol - keep the subscription so no
+            # ticks are missed
+            handler = common.SubscriptionHandlerAlert(new_alert)
+            handler_by_alertID[alertID] = handler
+            multi_handler.handler_by_alertID[alertID] = handler
+            continue
+
+        del handler_by_alertID[alertID]
+        del multi_handler.handler_by_alertID[alertID]
+        if not multi_handler.handler_by_alertID:
+            logger.info('Unsubscribing from %s...', symbol)
+            handle_by_symbol.pop(symbol).close()
+            del multi_handler_by_symbol[symbol]
+
+    for alertID, alert in alert_by_alertID.items():
+        prev_alert = prev_alert_by_alertID.get(alertID)
+        if prev_alert is None or prev_alert['symbol'] != alert['symbol']:
+            symbol = alert['symbol']
+            handler = common.SubscriptionHandlerAlert(alert)
+            handler_by_alertID[alertID] = handler
+
+            multi_handler = multi_handler_by_symbol.get(symbol)
+            if multi_handler is None:
+                multi_handler = MultiAlertHandler()
+                multi_handler.handler_by_alertID[alertID] = handler
+                multi_handler_by_symbol[symbol] = multi_handler
+                handle_by_symbol[symbol] = subscribe(symbol, multi_handler)
+            else:
+                multi_handler.handler_by_alertID[alertID] = handler
+
+
+# Function to flag a change to the configuration file
 def watch_config_file(config_path):
-    global config_updated
     global config_modified_time
-    global config_watch_timer
 
-    if config_path.stat().st_mtime > config_modified_time:
-        config_modified_time = config_path.stat().st_mtime
-        config_updated = True
+    try:
+        modified_time = config_path.stat().st_mtime
+    except FileNotFoundError:
+        # Mid-save by an editor which replaces the file
+        return
+
+    if modified_time > config_modified_time:
+        config_modified_time = modified_time
+        config_updated_event.set()
+
+
+class ConfigWatchHandler(FileSystemEventHandler):
+    """
+    A FileSystemEventHandler which checks the configuration file whenever
+    the filesystem reports a change to it. Only some observers report
+    closed files, so modified and created files are checked too - a
+    half-written file fails to parse and is reloaded on the next event.
+
+    Attributes:
+        config_path (Path): The resolved path of the configuration file.
+
+    Methods:
+        on_created(event):
+            Called when a file is created.
+        on_modified(event):
+            Called when a file is modified.
+        on_closed(event):
+            Called when a file opened for writing is closed.
+        on_moved(event):
+            Called when a file is moved or renamed.
+    """
+
+    def __init__(self, config_path):
+        self.config_path = config_path.resolve()
+
+    def on_created(self, event):
+        self._check_path(event.src_path)
+
+    def on_modified(self, event):
+        self._check_path(event.src_path)
 
-    config_watch_timer.run()
+    def on_closed(self, event):
+        # Saved in place
+        self._check_path(event.src_path)
+
+    def on_moved(self, event):
+        # Saved by writing a new file and moving it over the original
+        self._check_path(event.dest_path)
+
+    def _check_path(self, path):
+        if Path(path).resolve() == self.config_path:
+            watch_config_file(self.config_path)
 
 
 # Initialize the configuration update flags
-config_updated = False
+config_updated_event = threading.Event()
 config_modified_time = config_path.stat().st_mtime
 
 # Load the configuration file
-config = load_config(config_path)
+config, config_content_hash = load_config(config_path)
+alert_by_alertID = {alert['alertID']: alert for alert in config['alerts']}
 
-# Create a timer to watch the configuration file
-config_watch_timer = Timer(5, watch_config_file, [config_path])
-config_watch_timer.start()
+# Watch the configuration file's directory for changes
+config_observer = Observer()
+config_observer.daemon = True
+config_observer.schedule(ConfigWatchHandler(config_path),
+                         str(config_path.resolve().parent),
+                         recursive=False)
+config_observer.start()
 
 
 # Start the ACTIV session
@@ -111,7 +294,9 @@ session, parameters_handle = start_session(config)
 
 
 # Configure the subscriptions
-handler_by_alertID, handle_by_alertID = configure_subscriptions(config)
+(handler_by_alertID,
+ multi_handler_by_symbol,
+ handle_by_symbol) = configure_subscriptions(config)
 
 
 # Loop to process the session and subscriptions
@@ -124,24 +309,37 @@ try:
                 subscriptionError = True
                 break
 
-        # Configuration file has been modified - stop subscriptions and restart
-        if config_updated and not subscriptionError:
-            logger.info(
-                'Configuration file updated - restarting subscriptions...')
-            for handle in handle_by_alertID.values():
-                handle.close()
-            handler_by_alertID.clear()
-            handler_by_alertID.clear()
-
-            config = load_config(config_path)
-            handler_by_alertID, handle_by_alertID = configure_subscriptions(
-                config)
-
-            config_updated = False
+        # Configuration file has been modified - update the subscriptions
+        # for the alerts which have changed
+        if config_updated_event.is_set() and not subscriptionError:
+            config_updated_event.clear()
+
+            try:
+                new_config, config_content_hash = load_config(
+                    config_path, config_content_hash)
+            except (orjson.JSONDecodeError, OSError) as e:
+                # Keep the current alerts until the file is valid again
+                logger.error('Unable to reload the configuration file: %s', e)
+                new_config = None
+
+            # Ignore saves and touches which leave the content unchanged
+            if new_config is not None:
+                logger.info(
+                    'Configuration file updated - updating subscriptions...')
+
+                config = new_config
+                prev_alert_by_alertID = alert_by_alertID
+                alert_by_alertID = {alert['alertID']: alert
+                                    for alert in config['alerts']}
+                update_subscriptions(prev_alert_by_alertID, alert_by_alertID,
+                                     handler_by_alertID,
+                                     multi_handler_by_symbol,
+                                     handle_by_symbol)
 
 except KeyboardInterrupt:
     pass
 finally:
-    for handle in handle_by_alertID.values():
+    for handle in handle_by_symbol.values():
         handle.close()
-    config_watch_timer.cancel()
+    config_observer.stop()
+    config_observer.join()